@@ -1,11 +1,26 @@
 import os
+import argparse
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import logging
-from typing import Dict, Optional,Tuple,List
+from typing import Dict, Optional,Tuple,List,TypedDict,Union
 import json
 import re
+import hashlib
+import math
+from array import array
+import time
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.api_core import retry as google_retry
+from google.api_core import retry_async as google_retry_async
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +29,116 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Gemini model used for email content generation
+GEMINI_MODEL = 'gemini-1.5-flash'
+
+# Fixed email requirements, sent once as the model's system instruction so every
+# request shares the same prefix and only the user's request varies
+_ENHANCED_PROMPT_TEMPLATE_STATIC_PART = """
+Requirements:
+- Keep the tone professional and engaging
+- Structure the content with clear paragraphs
+- Include relevant details and context
+- End with a clear call to action or conclusion
+"""
+
+# Variable part of every prompt sent to Gemini
+_ENHANCED_PROMPT_TEMPLATE = """
+Please generate professional email content based on the following request:
+{prompt}
+"""
+# The template's full first line, so only prompts that came out of the template count as wrapped
+_ENHANCED_PROMPT_MARKER = _ENHANCED_PROMPT_TEMPLATE.strip().splitlines()[0]
+
+# Prompt for the single structured call that extracts the email details and writes the body
+_EMAIL_PLAN_PROMPT_TEMPLATE = """
+Read the following request for an email:
+{prompt}
+
+Return the recipient's email address, the subject (use "No Subject" if the request
+does not give one) and the professional email body written for the request.
+The recipient must be one of the email addresses written in the request, copied exactly;
+never guess or complete an address from a name.
+"""
+
+
+class EmailPlan(TypedDict):
+    """Structured Gemini response describing an email to send."""
+    recipient: str
+    subject: str
+    body: str
+
+
+_EMAIL_PLAN_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=EmailPlan
+)
+
+# Polling interval and terminal states for Gemini batch jobs
+BATCH_POLL_INTERVAL = 30
+BATCH_COMPLETED_STATES = {
+    'JOB_STATE_SUCCEEDED',
+    'JOB_STATE_FAILED',
+    'JOB_STATE_CANCELLED',
+    'JOB_STATE_EXPIRED',
+}
+
+# Pattern used to find the addresses in a prompt that Gemini may pick the recipient from
+_EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+
+# Connection pool and timeout settings for the n8n webhook session
+WEBHOOK_POOL_CONNECTIONS = 10
+WEBHOOK_POOL_MAXSIZE = 50
+WEBHOOK_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+WEBHOOK_MAX_WORKERS = 8  # background threads posting to the webhook
+# Each webhook post sends an email, so only retry when n8n cannot have processed it:
+# connection failures and statuses that reject the request outright. Read timeouts and
+# gateway errors may arrive after the mail node ran and are never retried.
+WEBHOOK_RETRY_ATTEMPTS = 3
+WEBHOOK_BACKOFF_FACTOR = 0.3
+WEBHOOK_RETRY_STATUSES = frozenset([429, 503])
+# Errors raised before the request reaches n8n (refused connection, DNS failure, connect timeout)
+_WEBHOOK_CONNECT_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError)
+WEBHOOK_RETRY = Retry(
+    total=WEBHOOK_RETRY_ATTEMPTS,
+    connect=WEBHOOK_RETRY_ATTEMPTS,
+    read=0,
+    other=0,
+    status=WEBHOOK_RETRY_ATTEMPTS,
+    backoff_factor=WEBHOOK_BACKOFF_FACTOR,
+    status_forcelist=WEBHOOK_RETRY_STATUSES,
+    allowed_methods=frozenset(["POST"]),
+    raise_on_status=False
+)
+
+# Timeout and exponential backoff for Gemini calls hitting rate limits or transient outages
+GEMINI_TIMEOUT = 60  # seconds per attempt
+GEMINI_MAX_CONCURRENCY = 4  # concurrent Gemini calls in bulk mode, to stay under the RPM limit
+_GEMINI_RETRY_PREDICATE = google_retry.if_exception_type(
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable
+)
+_GEMINI_REQUEST_OPTIONS = {
+    "timeout": GEMINI_TIMEOUT,
+    "retry": google_retry.Retry(
+        predicate=_GEMINI_RETRY_PREDICATE, initial=1.0, maximum=8.0, multiplier=2.0, timeout=30.0
+    )
+}
+_GEMINI_ASYNC_REQUEST_OPTIONS = {
+    "timeout": GEMINI_TIMEOUT,
+    "retry": google_retry_async.AsyncRetry(
+        predicate=_GEMINI_RETRY_PREDICATE, initial=1.0, maximum=8.0, multiplier=2.0, timeout=30.0
+    )
+}
+
+# Maximum number of generated responses kept in the in-process prompt cache
+LLM_CACHE_MAXSIZE = 512
+
+# Semantic cache settings: prompts whose embeddings are at least this similar reuse a cached response
+EMBEDDING_MODEL = 'models/gemini-embedding-001'
+EMBEDDING_DIMENSIONALITY = 256
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
 class N8nEmailSender:
     def __init__(self):
         self.n8n_webhook_url = os.getenv('N8N_WEBHOOK_URL')
@@ -26,88 +151,441 @@ class N8nEmailSender:
         if not self.gemini_api_key:
             raise ValueError("GOOGLE_API_KEY must be set in environment variables")
             
+        # Webhook headers are the same for every request
+        self._headers = {
+            "Content-Type": "application/json",
+            "X-N8N-API-KEY": self.api_key
+        }
+
+        # Reuse keep-alive connections to the n8n webhook across sends
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=WEBHOOK_POOL_CONNECTIONS,
+            pool_maxsize=WEBHOOK_POOL_MAXSIZE,
+            max_retries=WEBHOOK_RETRY
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Background threads so callers need not block on the webhook round trip
+        self._executor = ThreadPoolExecutor(max_workers=WEBHOOK_MAX_WORKERS)
+            
         # Configure Gemini
         genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = genai.GenerativeModel(
+            GEMINI_MODEL,
+            system_instruction=_ENHANCED_PROMPT_TEMPLATE_STATIC_PART
+        )
+
+        # Exact-match LRU cache of prompt hash -> generated content
+        self._llm_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Semantic cache of ((recipient, subject), normalized prompt embedding, generated content);
+        # entries are only reused for the same recipient and subject
+        self._semantic_cache: List[Tuple[Tuple[str, str], array, str]] = []
+
+    def close(self) -> None:
+        """Wait for pending background webhook posts, then release the thread pool and HTTP connections."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self) -> "N8nEmailSender":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _embed_prompt(self, prompt: str) -> Optional[array]:
+        """
+        Compute a unit-length embedding for a prompt using Gemini embeddings
+        
+        Args:
+            prompt: The prompt to embed
+            
+        Returns:
+            Optional[array]: Normalized embedding or None if embedding fails
+        """
+        try:
+            result = genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=prompt,
+                output_dimensionality=EMBEDDING_DIMENSIONALITY,
+                request_options=_GEMINI_REQUEST_OPTIONS
+            )
+            return self._normalize_embedding(result['embedding'])
+        except Exception as e:
+            logger.warning(f"Error embedding prompt, skipping semantic cache: {str(e)}")
+            return None
+
+    async def _embed_prompt_async(self, prompt: str) -> Optional[array]:
+        """Async variant of _embed_prompt."""
+        try:
+            result = await genai.embed_content_async(
+                model=EMBEDDING_MODEL,
+                content=prompt,
+                output_dimensionality=EMBEDDING_DIMENSIONALITY,
+                request_options=_GEMINI_ASYNC_REQUEST_OPTIONS
+            )
+            return self._normalize_embedding(result['embedding'])
+        except Exception as e:
+            logger.warning(f"Error embedding prompt, skipping semantic cache: {str(e)}")
+            return None
+
+    def _normalize_embedding(self, embedding: List[float]) -> Optional[array]:
+        """Scale an embedding to unit length as a compact float array, or return None for a zero vector."""
+        norm = math.sqrt(sum(x * x for x in embedding))
+        if not norm:
+            return None
+        return array('f', (x / norm for x in embedding))
+
+    def _semantic_scope(self, recipient: Optional[str], subject: Optional[str]) -> Optional[Tuple[str, str]]:
+        """Return the semantic cache scope for an email, or None if the recipient is unknown."""
+        if not recipient:
+            return None
+        return recipient.strip().lower(), (subject or "").strip()
+
+    def _lookup_semantic_cache(self, scope: Tuple[str, str], embedding: array) -> Optional[str]:
+        """
+        Find the cached response for the same recipient and subject whose prompt is most similar
+        
+        Args:
+            scope: (recipient, subject) the content is being generated for
+            embedding: Normalized embedding of the incoming prompt
+            
+        Returns:
+            Optional[str]: Cached content if similarity exceeds the threshold, otherwise None
+        """
+        best_score = 0.0
+        best_content = None
+        for cached_scope, cached_embedding, content in self._semantic_cache:
+            if cached_scope != scope:
+                continue
+            score = sum(a * b for a, b in zip(embedding, cached_embedding))
+            if score > best_score:
+                best_score, best_content = score, content
+        
+        if best_score >= SEMANTIC_CACHE_THRESHOLD:
+            logger.info(f"Using semantically cached LLM content (similarity {best_score:.3f})")
+            return best_content
+        return None
+
+    def _build_enhanced_prompt(self, prompt: str) -> str:
+        """
+        Wrap a user prompt in the email generation template
+        
+        Prompts that already went through the template are returned unchanged so
+        they are not wrapped twice.
+        
+        Args:
+            prompt: The user's prompt or an already enhanced prompt
+            
+        Returns:
+            str: Prompt to send to Gemini
+        """
+        if prompt.lstrip().startswith(_ENHANCED_PROMPT_MARKER):
+            return prompt
+        return _ENHANCED_PROMPT_TEMPLATE.format(prompt=prompt)
+
+    def _cache_key(self, enhanced_prompt: str) -> str:
+        """Return the exact-match cache key for an enhanced prompt."""
+        return hashlib.blake2b(enhanced_prompt.encode('utf-8')).hexdigest()
+
+    def _get_cached_llm_content(self, cache_key: str) -> Optional[str]:
+        """Return exact-match cached content for a cache key, refreshing its LRU position."""
+        cached = self._llm_cache.get(cache_key)
+        if cached is not None:
+            self._llm_cache.move_to_end(cache_key)
+            logger.info("Using cached LLM content")
+        return cached
+
+    def _store_llm_content(self,
+                           cache_key: str,
+                           content: str,
+                           embedding: Optional[array] = None,
+                           scope: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Store generated content in the exact-match and semantic caches
+        
+        Args:
+            cache_key: Exact-match cache key of the enhanced prompt
+            content: Generated content
+            embedding: Optional normalized prompt embedding for the semantic cache
+            scope: (recipient, subject) the content was generated for; required for the semantic cache
+        """
+        self._llm_cache[cache_key] = content
+        if len(self._llm_cache) > LLM_CACHE_MAXSIZE:
+            self._llm_cache.popitem(last=False)
+        if embedding is not None and scope is not None:
+            self._semantic_cache.append((scope, embedding, content))
+            if len(self._semantic_cache) > LLM_CACHE_MAXSIZE:
+                self._semantic_cache.pop(0)
+
+    def _finished_stream_text(self, chunks: List) -> Optional[str]:
+        """
+        Join streamed Gemini chunks, rejecting generations that did not finish normally
+        
+        A stream cut short for SAFETY, RECITATION or MAX_TOKENS still carries partial
+        text, so the final chunk's finish reason must be STOP for the content to be used.
+        
+        Args:
+            chunks: All chunks of a streamed generate_content response
+            
+        Returns:
+            Optional[str]: Complete generated content, or None if generation was blocked, cut short or empty
+        """
+        if not chunks or not chunks[-1].candidates:
+            feedback = chunks[-1].prompt_feedback if chunks else "empty stream"
+            logger.error(f"No content generated by Gemini: {feedback}")
+            return None
+        
+        finish_reason = chunks[-1].candidates[0].finish_reason
+        if finish_reason.name != 'STOP':
+            logger.error(f"Gemini stopped generating early: {finish_reason.name}")
+            return None
+        
+        content = "".join(
+            part.text
+            for chunk in chunks if chunk.candidates
+            for part in chunk.candidates[0].content.parts
+        )
+        if not content:
+            logger.error("Empty response from Gemini")
+            return None
+        return content
 
-    def generate_llm_content(self, prompt: str) -> Optional[str]:
+    def generate_llm_content(self,
+                             prompt: str,
+                             recipient: Optional[str] = None,
+                             subject: Optional[str] = None) -> Optional[str]:
         """
         Generate content using Google's Gemini LLM
         
         Args:
             prompt: The prompt to generate content from
+            recipient: Optional recipient the content is for; enables the semantic cache
+            subject: Optional subject the content is for
             
         Returns:
             Optional[str]: Generated content or None if generation fails
         """
         try:
             # Create a more detailed prompt for email content
-            enhanced_prompt = f"""
-            Please generate professional email content based on the following request:
-            {prompt}
-            
-            Requirements:
-            - Keep the tone professional and engaging
-            - Structure the content with clear paragraphs
-            - Include relevant details and context
-            - End with a clear call to action or conclusion
-            """
-            
-            # Generate content using Gemini
-            response = self.model.generate_content(enhanced_prompt)
-            
-            if response and response.text:
-                return response.text
-            else:
-                logger.error("Empty response from Gemini")
-                return None
+            enhanced_prompt = self._build_enhanced_prompt(prompt)
+            
+            # Serve identical prompts from the cache instead of calling Gemini again
+            cache_key = self._cache_key(enhanced_prompt)
+            cached = self._get_cached_llm_content(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Fall back to a near-duplicate prompt for the same recipient and subject
+            scope = self._semantic_scope(recipient, subject)
+            embedding = self._embed_prompt(prompt) if scope else None
+            if embedding is not None:
+                cached = self._lookup_semantic_cache(scope, embedding)
+                if cached is not None:
+                    return cached
+            
+            # Generate content using Gemini, streaming chunks as they are produced
+            response = self.model.generate_content(
+                enhanced_prompt,
+                stream=True,
+                request_options=_GEMINI_REQUEST_OPTIONS
+            )
+            content = self._finished_stream_text(list(response))
+            
+            if content:
+                self._store_llm_content(cache_key, content, embedding, scope)
+            return content
                 
         except Exception as e:
             logger.error(f"Error generating LLM content: {str(e)}")
             return None
 
-    def send_email(self, 
-                  recipient: str, 
-                  subject: str, 
-                  prompt: str,
-                  template_id: Optional[str] = None) -> bool:
+    async def generate_llm_content_async(self,
+                                         prompt: str,
+                                         recipient: Optional[str] = None,
+                                         subject: Optional[str] = None) -> Optional[str]:
         """
-        Send an email using n8n webhook
+        Async variant of generate_llm_content, sharing the same caches
+        
+        Args:
+            prompt: The prompt to generate content from
+            recipient: Optional recipient the content is for; enables the semantic cache
+            subject: Optional subject the content is for
+            
+        Returns:
+            Optional[str]: Generated content or None if generation fails
+        """
+        try:
+            enhanced_prompt = self._build_enhanced_prompt(prompt)
+            
+            cache_key = self._cache_key(enhanced_prompt)
+            cached = self._get_cached_llm_content(cache_key)
+            if cached is not None:
+                return cached
+            
+            scope = self._semantic_scope(recipient, subject)
+            embedding = await self._embed_prompt_async(prompt) if scope else None
+            if embedding is not None:
+                cached = self._lookup_semantic_cache(scope, embedding)
+                if cached is not None:
+                    return cached
+            
+            response = await self.model.generate_content_async(
+                enhanced_prompt,
+                stream=True,
+                request_options=_GEMINI_ASYNC_REQUEST_OPTIONS
+            )
+            content = self._finished_stream_text([chunk async for chunk in response])
+            
+            if content:
+                self._store_llm_content(cache_key, content, embedding, scope)
+            return content
+                
+        except Exception as e:
+            logger.error(f"Error generating LLM content: {str(e)}")
+            return None
+
+    def _validate_email_plan(self, plan_json: str, prompt: str) -> Optional[EmailPlan]:
+        """
+        Parse and validate the JSON returned by a structured email plan call
+        
+        The recipient is only accepted if the user typed that address in the prompt.
+        
+        Args:
+            plan_json: Raw JSON text returned by Gemini
+            prompt: User's input prompt the plan was generated from
+            
+        Returns:
+            Optional[EmailPlan]: Normalized plan, or None if it is incomplete or invalid
+        """
+        plan = json.loads(plan_json)
+        if not all(isinstance(plan.get(field), str) for field in EmailPlan.__annotations__):
+            logger.error(f"Incomplete email details from Gemini: {plan_json}")
+            return None
+        
+        plan['recipient'] = plan['recipient'].strip()
+        plan['subject'] = plan['subject'].strip() or "No Subject"
+        prompt_addresses = {address.lower() for address in _EMAIL_RE.findall(prompt)}
+        if plan['recipient'].lower() not in prompt_addresses:
+            logger.error(f"Recipient {plan['recipient']!r} from Gemini does not appear in prompt")
+            return None
+        if not plan['body'].strip():
+            logger.error("Empty email body from Gemini")
+            return None
+        return plan
+
+    def generate_email_plan(self, prompt: str) -> Optional[EmailPlan]:
+        """
+        Extract the email details and generate the body with a single structured Gemini call
+        
+        Args:
+            prompt: User's input prompt
+            
+        Returns:
+            Optional[EmailPlan]: Recipient, subject and body, or None if generation or validation fails
+        """
+        if not _EMAIL_RE.search(prompt):
+            logger.error("No email address found in prompt")
+            return None
+
+        try:
+            plan_prompt = _EMAIL_PLAN_PROMPT_TEMPLATE.format(prompt=prompt)
+            
+            cache_key = self._cache_key(plan_prompt)
+            plan_json = self._get_cached_llm_content(cache_key)
+            if plan_json is None:
+                response = self.model.generate_content(
+                    plan_prompt,
+                    generation_config=_EMAIL_PLAN_GENERATION_CONFIG,
+                    request_options=_GEMINI_REQUEST_OPTIONS
+                )
+                if not response or not response.text:
+                    logger.error("Empty response from Gemini")
+                    return None
+                plan_json = response.text
+            
+            plan = self._validate_email_plan(plan_json, prompt)
+            if plan:
+                # Only cache plans that passed validation
+                self._store_llm_content(cache_key, plan_json)
+            return plan
+            
+        except Exception as e:
+            logger.error(f"Error generating email plan: {str(e)}")
+            return None
+
+    async def generate_email_plan_async(self, prompt: str) -> Optional[EmailPlan]:
+        """Async variant of generate_email_plan, sharing the same cache."""
+        if not _EMAIL_RE.search(prompt):
+            logger.error("No email address found in prompt")
+            return None
+
+        try:
+            plan_prompt = _EMAIL_PLAN_PROMPT_TEMPLATE.format(prompt=prompt)
+            
+            cache_key = self._cache_key(plan_prompt)
+            plan_json = self._get_cached_llm_content(cache_key)
+            if plan_json is None:
+                response = await self.model.generate_content_async(
+                    plan_prompt,
+                    generation_config=_EMAIL_PLAN_GENERATION_CONFIG,
+                    request_options=_GEMINI_ASYNC_REQUEST_OPTIONS
+                )
+                if not response or not response.text:
+                    logger.error("Empty response from Gemini")
+                    return None
+                plan_json = response.text
+            
+            plan = self._validate_email_plan(plan_json, prompt)
+            if plan:
+                self._store_llm_content(cache_key, plan_json)
+            return plan
+            
+        except Exception as e:
+            logger.error(f"Error generating email plan: {str(e)}")
+            return None
+
+    def _build_payload(self,
+                       recipient: str,
+                       subject: str,
+                       content: str,
+                       template_id: Optional[str] = None) -> Dict:
+        """Build the JSON payload expected by the n8n webhook."""
+        return {
+            "recipient": recipient,
+            "subject": subject,
+            "content": content,
+            "template_id": template_id
+        }
+
+    def _post_to_webhook(self,
+                         recipient: str,
+                         subject: str,
+                         content: str,
+                         template_id: Optional[str] = None) -> bool:
+        """
+        Post generated email content to the n8n webhook
         
         Args:
             recipient: Email address of the recipient
             subject: Email subject
-            prompt: Prompt for LLM content generation
+            content: Generated email content
             template_id: Optional template ID for email formatting
             
         Returns:
-            bool: True if email was sent successfully, False otherwise
+            bool: True if the webhook accepted the email, False otherwise
         """
         try:
-            # Generate content using LLM
-            content = self.generate_llm_content(prompt)
-            if not content:
-                return False
-
             # Prepare payload for n8n webhook
-            payload = {
-                "recipient": recipient,
-                "subject": subject,
-                "content": content,
-                "template_id": template_id
-            }
+            payload = self._build_payload(recipient, subject, content, template_id)
 
             # Send request to n8n webhook
-            headers = {
-                "Content-Type": "application/json",
-                "X-N8N-API-KEY": self.api_key
-            }
-
             logger.info(f"Attempting to send request to n8n webhook: {self.n8n_webhook_url}")
-            response = requests.post(
+            response = self.session.post(
                 self.n8n_webhook_url,
                 json=payload,
-                headers=headers
+                headers=self._headers,
+                timeout=WEBHOOK_TIMEOUT
             )
 
             if response.status_code == 200:
@@ -123,15 +601,334 @@ class N8nEmailSender:
             logger.error(f"Error sending email: {str(e)}")
             return False
 
+    def _failed_future(self) -> "Future[bool]":
+        """Return an already resolved Future reporting a failed send."""
+        failed: "Future[bool]" = Future()
+        failed.set_result(False)
+        return failed
+
+    def send_email(self, 
+                  recipient: str, 
+                  subject: str, 
+                  prompt: str,
+                  template_id: Optional[str] = None,
+                  content: Optional[str] = None,
+                  wait: bool = True) -> Union[bool, "Future[bool]"]:
+        """
+        Send an email using n8n webhook
+        
+        Args:
+            recipient: Email address of the recipient
+            subject: Email subject
+            prompt: Prompt for LLM content generation
+            template_id: Optional template ID for email formatting
+            content: Optional pre-generated content; skips LLM generation when supplied
+            wait: Block until the webhook responds; when False the post runs in the background
+            
+        Returns:
+            Union[bool, Future[bool]]: True if email was sent successfully, False otherwise;
+            when wait is False, a Future resolving to that value
+        """
+        try:
+            # Generate content using LLM
+            if content is None:
+                content = self.generate_llm_content(prompt, recipient, subject)
+        except Exception as e:
+            logger.error(f"Error sending email: {str(e)}")
+            content = None
+
+        if not content:
+            if wait:
+                return False
+            return self._failed_future()
+
+        if wait:
+            return self._post_to_webhook(recipient, subject, content, template_id)
+        try:
+            return self._executor.submit(self._post_to_webhook, recipient, subject, content, template_id)
+        except RuntimeError as e:
+            # The executor refuses new work once close() has been called
+            logger.error(f"Error sending email: {str(e)}")
+            return self._failed_future()
+
+    def create_async_session(self) -> aiohttp.ClientSession:
+        """
+        Create a pooled aiohttp session for posting to the n8n webhook
+        
+        Must be called from a running event loop; the caller is responsible for closing it.
+        
+        Returns:
+            aiohttp.ClientSession: Session with the webhook headers and timeouts applied
+        """
+        connect_timeout, read_timeout = WEBHOOK_TIMEOUT
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=WEBHOOK_POOL_MAXSIZE, keepalive_timeout=30),
+            headers=self._headers,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        )
+
+    def _webhook_backoff(self, attempt: int) -> float:
+        """Return urllib3's backoff before retry number attempt + 1: none for the first, then doubling."""
+        if attempt == 0:
+            return 0.0
+        return min(getattr(WEBHOOK_RETRY, 'backoff_max', Retry.DEFAULT_BACKOFF_MAX), WEBHOOK_BACKOFF_FACTOR * (2 ** attempt))
+
+    async def _post_to_webhook_async(self,
+                                     session: aiohttp.ClientSession,
+                                     recipient: str,
+                                     subject: str,
+                                     content: str,
+                                     template_id: Optional[str] = None) -> bool:
+        """
+        Async variant of _post_to_webhook, applying the same retry policy as WEBHOOK_RETRY
+        
+        Args:
+            session: Session from create_async_session
+            recipient: Email address of the recipient
+            subject: Email subject
+            content: Generated email content
+            template_id: Optional template ID for email formatting
+            
+        Returns:
+            bool: True if the webhook accepted the email, False otherwise
+        """
+        payload = self._build_payload(recipient, subject, content, template_id)
+
+        for attempt in range(WEBHOOK_RETRY_ATTEMPTS + 1):
+            retry_after = None
+            try:
+                logger.info(f"Attempting to send request to n8n webhook: {self.n8n_webhook_url}")
+                async with session.post(self.n8n_webhook_url, json=payload) as response:
+                    if response.status == 200:
+                        logger.info(f"Email sent successfully to {recipient}")
+                        return True
+                    if response.status not in WEBHOOK_RETRY_STATUSES or attempt == WEBHOOK_RETRY_ATTEMPTS:
+                        logger.error(f"Failed to send email. Status code: {response.status}")
+                        logger.error(f"Response content: {await response.text()}")
+                        logger.error(f"Request URL: {self.n8n_webhook_url}")
+                        return False
+                    header = response.headers.get("Retry-After")
+                    if header:
+                        try:
+                            retry_after = WEBHOOK_RETRY.parse_retry_after(header)
+                        except Exception:
+                            retry_after = None
+            except _WEBHOOK_CONNECT_ERRORS as e:
+                # The request never reached n8n, so it is safe to send again
+                if attempt == WEBHOOK_RETRY_ATTEMPTS:
+                    logger.error(f"Error sending email: {str(e)}")
+                    return False
+
+            await asyncio.sleep(retry_after if retry_after is not None else self._webhook_backoff(attempt))
+        return False
+
+    async def send_email_async(self,
+                               recipient: str,
+                               subject: str,
+                               prompt: str,
+                               template_id: Optional[str] = None,
+                               content: Optional[str] = None,
+                               session: Optional[aiohttp.ClientSession] = None,
+                               llm_semaphore: Optional[asyncio.Semaphore] = None) -> bool:
+        """
+        Async variant of send_email for sending many emails concurrently
+        
+        Args:
+            recipient: Email address of the recipient
+            subject: Email subject
+            prompt: Prompt for LLM content generation
+            template_id: Optional template ID for email formatting
+            content: Optional pre-generated content; skips LLM generation when supplied
+            session: Optional shared session from create_async_session; a temporary one is used otherwise
+            llm_semaphore: Optional semaphore bounding concurrent Gemini calls; the webhook post is not limited
+            
+        Returns:
+            bool: True if email was sent successfully, False otherwise
+        """
+        if session is None:
+            async with self.create_async_session() as own_session:
+                return await self.send_email_async(
+                    recipient, subject, prompt, template_id,
+                    content=content, session=own_session, llm_semaphore=llm_semaphore
+                )
+
+        try:
+            if content is None:
+                if llm_semaphore is None:
+                    content = await self.generate_llm_content_async(prompt, recipient, subject)
+                else:
+                    async with llm_semaphore:
+                        content = await self.generate_llm_content_async(prompt, recipient, subject)
+            if not content:
+                return False
+
+            return await self._post_to_webhook_async(session, recipient, subject, content, template_id)
+
+        except Exception as e:
+            logger.error(f"Error sending email: {str(e)}")
+            return False
+
+    async def send_many_async(self, jobs: List[Dict]) -> List[bool]:
+        """
+        Send many emails concurrently over a single pooled session
+        
+        Args:
+            jobs: List of dictionaries with 'recipient', 'subject', 'prompt' and optional 'template_id'
+            
+        Returns:
+            List[bool]: Per-job send status, in the same order as jobs
+        """
+        # Bound concurrent Gemini calls to stay under the RPM limit; posts use the connector's limit
+        llm_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        async with self.create_async_session() as session:
+            return await asyncio.gather(*(
+                self.send_email_async(
+                    job['recipient'],
+                    job['subject'],
+                    job['prompt'],
+                    job.get('template_id'),
+                    session=session,
+                    llm_semaphore=llm_semaphore
+                )
+                for job in jobs
+            ))
+
+    def _generate_batch_content(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """
+        Generate content for many prompts with a single Gemini Batch API job
+        
+        Args:
+            prompts: Mapping of request key to enhanced prompt
+            
+        Returns:
+            Dict[str, str]: Mapping of request key to generated content for successful requests
+        """
+        # The batch API is only exposed by the google-genai client
+        from google import genai as genai_client
+
+        client = genai_client.Client(api_key=self.gemini_api_key)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            for key, enhanced_prompt in prompts.items():
+                request = {
+                    "key": key,
+                    "request": {
+                        "system_instruction": {"parts": [{"text": _ENHANCED_PROMPT_TEMPLATE_STATIC_PART}]},
+                        "contents": [{"parts": [{"text": enhanced_prompt}]}]
+                    }
+                }
+                f.write(json.dumps(request) + "\n")
+            requests_path = f.name
+
+        try:
+            uploaded = client.files.upload(
+                file=requests_path,
+                config={"display_name": "bulk-email-requests", "mime_type": "jsonl"}
+            )
+        finally:
+            os.remove(requests_path)
+
+        batch_job = client.batches.create(
+            model=GEMINI_MODEL,
+            src=uploaded.name,
+            config={"display_name": "bulk-email-generation"}
+        )
+        logger.info(f"Submitted Gemini batch job {batch_job.name} with {len(prompts)} requests")
+
+        while batch_job.state.name not in BATCH_COMPLETED_STATES:
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch_job = client.batches.get(name=batch_job.name)
+
+        if batch_job.state.name != 'JOB_STATE_SUCCEEDED':
+            logger.error(f"Gemini batch job {batch_job.name} finished with state {batch_job.state.name}")
+            return {}
+
+        results = {}
+        result_lines = client.files.download(file=batch_job.dest.file_name).decode('utf-8')
+        for line in result_lines.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            try:
+                candidate = result['response']['candidates'][0]
+                parts = candidate['content']['parts']
+            except (KeyError, IndexError):
+                logger.error(f"No content generated for batch request {result.get('key')}: {result.get('error')}")
+                continue
+            # Like _finished_stream_text, drop output cut short by SAFETY, RECITATION or MAX_TOKENS
+            finish_reason = candidate.get('finishReason')
+            if finish_reason != 'STOP':
+                logger.error(f"Gemini stopped generating early for batch request {result['key']}: {finish_reason}")
+                continue
+            text = "".join(part.get('text', '') for part in parts)
+            if text:
+                results[result['key']] = text
+        return results
+
+    def send_bulk(self, jobs: List[Dict]) -> List[bool]:
+        """
+        Send many emails, generating their content with a single Gemini Batch API job
+        
+        Batch jobs trade latency (minutes to hours) for a lower price and separate
+        rate limits, so this is meant for non-interactive bulk sends.
+        
+        Args:
+            jobs: List of dictionaries with 'recipient', 'subject', 'prompt' and optional 'template_id'
+            
+        Returns:
+            List[bool]: Per-job send status, in the same order as jobs
+        """
+        contents: Dict[str, str] = {}
+        pending: Dict[str, str] = {}
+        cache_keys: Dict[str, str] = {}
+
+        # Reuse cached content where possible and batch the rest
+        for index, job in enumerate(jobs):
+            key = str(index)
+            enhanced_prompt = self._build_enhanced_prompt(job['prompt'])
+            cache_keys[key] = self._cache_key(enhanced_prompt)
+            cached = self._get_cached_llm_content(cache_keys[key])
+            if cached is not None:
+                contents[key] = cached
+            else:
+                pending[key] = enhanced_prompt
+
+        if pending:
+            try:
+                generated = self._generate_batch_content(pending)
+            except Exception as e:
+                logger.error(f"Error generating batch LLM content: {str(e)}")
+                generated = {}
+            for key, content in generated.items():
+                self._store_llm_content(cache_keys[key], content)
+            contents.update(generated)
+
+        # Post all generated emails in parallel on the background threads
+        posts: List[Optional["Future[bool]"]] = []
+        for index, job in enumerate(jobs):
+            content = contents.get(str(index))
+            if not content:
+                logger.error(f"No content generated for {job['recipient']}")
+                posts.append(None)
+                continue
+            posts.append(self._executor.submit(
+                self._post_to_webhook,
+                job['recipient'],
+                job['subject'],
+                content,
+                job.get('template_id')
+            ))
+        return [post.result() if post else False for post in posts]
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
 class EmailAgent:
     def __init__(self):
         """Initialize the EmailAgent with N8nEmailSender instance."""
         self.email_sender = N8nEmailSender()
+
+    def close(self) -> None:
+        """Release the underlying N8nEmailSender, waiting for any pending webhook posts."""
+        self.email_sender.close()
         
     def process_user_prompt(self, prompt: str) -> Tuple[bool, str]:
         """
@@ -153,8 +950,9 @@ class EmailAgent:
             success = self.email_sender.send_email(
                 recipient=email_details['recipient'],
                 subject=email_details['subject'],
-                prompt=email_details['content_prompt'],
-                template_id=email_details.get('template_id')
+                prompt=prompt,
+                template_id=email_details.get('template_id'),
+                content=email_details['content']
             )
             
             if success:
@@ -166,6 +964,47 @@ class EmailAgent:
             logger.error(f"Error processing user prompt: {str(e)}")
             return False, f"Error: {str(e)}"
     
+    async def process_user_prompt_async(self,
+                                        prompt: str,
+                                        session: aiohttp.ClientSession,
+                                        llm_semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[bool, str]:
+        """
+        Async variant of process_user_prompt for handling many prompts concurrently.
+        
+        Args:
+            prompt: User's input prompt for email generation
+            session: Shared session from N8nEmailSender.create_async_session
+            llm_semaphore: Optional semaphore bounding concurrent Gemini calls; the webhook post is not limited
+            
+        Returns:
+            Tuple[bool, str]: (Success status, Response message)
+        """
+        try:
+            if llm_semaphore is None:
+                plan = await self.email_sender.generate_email_plan_async(prompt)
+            else:
+                async with llm_semaphore:
+                    plan = await self.email_sender.generate_email_plan_async(prompt)
+            if not plan:
+                return False, "Could not extract email details from the prompt"
+            
+            success = await self.email_sender.send_email_async(
+                recipient=plan['recipient'],
+                subject=plan['subject'],
+                prompt=prompt,
+                content=plan['body'],
+                session=session
+            )
+            
+            if success:
+                return True, f"Email sent successfully to {plan['recipient']}"
+            else:
+                return False, "Failed to send email"
+                
+        except Exception as e:
+            logger.error(f"Error processing user prompt: {str(e)}")
+            return False, f"Error: {str(e)}"
+
     def _parse_prompt(self, prompt: str) -> Optional[Dict]:
         """
         Parse the user's prompt to extract email details.
@@ -177,57 +1016,69 @@ class EmailAgent:
             Optional[Dict]: Dictionary containing email details or None if parsing fails
         """
         try:
-            # First, try to extract email and subject using regex
-            email_pattern = r'[\w\.-]+@[\w\.-]+\.\w+'
-            subject_pattern = r'subject:([^,]+)'
-            
-            email_match = re.search(email_pattern, prompt)
-            subject_match = re.search(subject_pattern, prompt, re.IGNORECASE)
-            
-            if not email_match:
-                logger.error("No email address found in prompt")
-                return None
-                
-            recipient = email_match.group(0)
-            subject = subject_match.group(1).strip() if subject_match else "No Subject"
-            
-            # Use Gemini to generate content
-            content_prompt = f"""
-            Generate a professional email content based on the following request:
-            {prompt}
-            
-            Requirements:
-            - Keep the tone professional and engaging
-            - Structure the content with clear paragraphs
-            - Include relevant details and context
-            - End with a clear call to action or conclusion
-            """
-            
-            response = self.email_sender.model.generate_content(content_prompt)
-            if not response or not response.text:
-                logger.error("Failed to generate content from Gemini")
+            # Extract recipient and subject and write the body in one Gemini call
+            plan = self.email_sender.generate_email_plan(prompt)
+            if not plan:
                 return None
-                
+            
             # Create the email details dictionary
             email_details = {
-                "recipient": recipient,
-                "subject": subject,
-                "content_prompt": response.text,
+                "recipient": plan['recipient'],
+                "subject": plan['subject'],
+                "content": plan['body'],
                 "template_id": None  # Optional template ID
             }
             
-            logger.info(f"Successfully parsed email details: {json.dumps(email_details, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Successfully parsed email details: %s", json.dumps(email_details, indent=2))
             return email_details
             
         except Exception as e:
             logger.error(f"Error parsing prompt: {str(e)}")
             return None
 
+async def main_bulk(agent: EmailAgent, prompts: List[str]) -> None:
+    """
+    Process many prompts concurrently, reporting each result as it completes.
+    
+    Args:
+        agent: EmailAgent used to process the prompts
+        prompts: User prompts, one email per prompt
+    """
+    # Gemini calls are throttled separately; the webhook side is bounded by the session's connector
+    llm_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+    async def process(index: int, prompt: str, session: aiohttp.ClientSession) -> Tuple[int, bool, str]:
+        success, message = await agent.process_user_prompt_async(prompt, session, llm_semaphore)
+        return index, success, message
+
+    async with agent.email_sender.create_async_session() as session:
+        tasks = [process(index, prompt, session) for index, prompt in enumerate(prompts, start=1)]
+        for finished in asyncio.as_completed(tasks):
+            index, success, message = await finished
+            print(f"\n[{index}/{len(prompts)}] Status: {'Success' if success else 'Failed'}")
+            print(f"Message: {message}")
+
 def main():
     """Main function to demonstrate the EmailAgent usage."""
+    parser = argparse.ArgumentParser(description="Send AI-generated emails through n8n")
+    parser.add_argument(
+        '--file',
+        type=argparse.FileType('r', encoding='utf-8'),
+        help="Process prompts from a file (one per line, '-' for stdin) concurrently instead of interactively"
+    )
+    args = parser.parse_args()
+
+    agent = None
     try:
         agent = EmailAgent()
         
+        if args.file:
+            with args.file:
+                prompts = [line.strip() for line in args.file if line.strip()]
+            asyncio.run(main_bulk(agent, prompts))
+            return
+        
         # Example usage
         print("Welcome to the Email Agent!")
         print("Please enter your email prompt (or 'x' to exit):")
@@ -247,6 +1098,9 @@ def main():
             
     except Exception as e:
         logger.error(f"Error in main execution: {str(e)}")
+    finally:
+        if agent:
+            agent.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file